@@ -292,26 +292,25 @@ type Contributor = {
 };
 
 function buildContributors(record: Record<string, unknown>): Contributor[] {
-  const sources: unknown[] = [];
-  if (Array.isArray(record.authors)) {
-    sources.push(...record.authors);
-  }
-  if (Array.isArray(record.nonPresenterAuthors)) {
-    sources.push(...record.nonPresenterAuthors);
-  }
   const seen = new Set<string>();
   const contributors: Contributor[] = [];
-  for (const item of sources) {
-    const contributor = normalizeContributor(item);
-    if (!contributor) {
+  // Read both author lists in place rather than concatenating them into a copy
+  for (const source of [record.authors, record.nonPresenterAuthors]) {
+    if (!Array.isArray(source)) {
       continue;
     }
-    const key = `${contributor.name}|${contributor.role ?? ''}|${contributor.type ?? ''}`;
-    if (seen.has(key)) {
-      continue;
+    for (const item of source) {
+      const contributor = normalizeContributor(item);
+      if (!contributor) {
+        continue;
+      }
+      const key = `${contributor.name}|${contributor.role ?? ''}|${contributor.type ?? ''}`;
+      if (seen.has(key)) {
+        continue;
+      }
+      seen.add(key);
+      contributors.push(contributor);
     }
-    seen.add(key);
-    contributors.push(contributor);
   }
   return contributors;
 }
@@ -415,10 +414,9 @@ function normalizeUrlForDedup(url: string): NormalizedUrl {
       }
       kept.append(key, value);
     }
-    parsed.search = kept.toString() ? `?${kept.toString()}` : '';
-    const key = `${parsed.protocol}//${host}${path}${
-      parsed.search ? `?${kept.toString()}` : ''
-    }`;
+    const query = kept.toString();
+    parsed.search = query ? `?${query}` : '';
+    const key = `${parsed.protocol}//${host}${path}${query ? `?${query}` : ''}`;
     return { key, url: parsed.toString() };
   } catch {
     const trimmed = url.trim();
@@ -474,19 +472,34 @@ function normalizeRecordImages(record: Record<string, unknown>): Record<string,
   };
 }
 
+const RESOURCE_EXTENSION_TYPES = new Map<string, string>([
+  ['jpg', 'image'],
+  ['jpeg', 'image'],
+  ['png', 'image'],
+  ['gif', 'image'],
+  ['tif', 'image'],
+  ['tiff', 'image'],
+  ['webp', 'image'],
+  ['pdf', 'pdf'],
+  ['mp3', 'audio'],
+  ['wav', 'audio'],
+  ['flac', 'audio'],
+  ['ogg', 'audio'],
+  ['mp4', 'video'],
+  ['mov', 'video'],
+  ['mkv', 'video'],
+  ['webm', 'video'],
+]);
+
+// Any extension followed by a query string or end of URL, checked in URL order
+const RESOURCE_EXTENSION_PATTERN = /\.([a-z0-9]+)(?=\?|$)/gi;
+
 function classifyUrl(url: string): string {
-  const lower = url.toLowerCase();
-  if (lower.match(/\.(jpg|jpeg|png|gif|tif|tiff|webp)(\?|$)/)) {
-    return 'image';
-  }
-  if (lower.match(/\.(pdf)(\?|$)/)) {
-    return 'pdf';
-  }
-  if (lower.match(/\.(mp3|wav|flac|ogg)(\?|$)/)) {
-    return 'audio';
-  }
-  if (lower.match(/\.(mp4|mov|mkv|webm)(\?|$)/)) {
-    return 'video';
+  for (const match of url.matchAll(RESOURCE_EXTENSION_PATTERN)) {
+    const type = RESOURCE_EXTENSION_TYPES.get(match[1].toLowerCase());
+    if (type) {
+      return type;
+    }
   }
   return 'external';
 }
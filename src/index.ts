@@ -14,6 +14,7 @@ type Env = {
   FINNA_API_BASE?: string;
   FINNA_UI_BASE?: string;
   ASSETS_BASE_URL?: string;
+  FINNA_ORGANIZATIONS_TTL?: string;
 };
 
 const HIERARCHICAL_FACET_FIELDS = new Set([
@@ -23,6 +24,9 @@ const HIERARCHICAL_FACET_FIELDS = new Set([
   'category_str_mv',
 ]);
 const DEFAULT_FACET_LIMIT = 30;
+// Organization list changes rarely; let the edge cache serve it across isolates
+const DEFAULT_ORGANIZATIONS_CACHE_TTL = 3600;
+const UPSTREAM_TIMEOUT_MS = 15000;
 
 const toolNames = [
   'search_records',
@@ -240,11 +244,14 @@ const ListToolsResponse = {
   ],
 };
 
+// The tool list is static, so serialize it once per isolate
+const LIST_TOOLS_BODY = JSON.stringify(ListToolsResponse);
+
 export default {
-  async fetch(request: Request, env: Env): Promise<Response> {
+  async fetch(request: Request, env: Env, ctx: ExecutionContext): Promise<Response> {
     const url = new URL(request.url);
     if (url.pathname === '/spec') {
-      return json(ListToolsResponse);
+      return jsonText(LIST_TOOLS_BODY);
     }
     if (url.pathname !== '/mcp') {
       return new Response('Not Found', { status: 404 });
@@ -254,18 +261,20 @@ export default {
     if (request.method === 'GET') {
       const accept = request.headers.get('accept') ?? '';
       if (accept.includes('text/event-stream')) {
-        return handleSseRequest(request, structuredOutput);
+        return handleSseRequest(url, structuredOutput);
       }
       return new Response('Method Not Allowed', { status: 405 });
     }
 
-    if (request.method === 'POST' && url.searchParams.get('session')) {
+    const sessionId = url.searchParams.get('session');
+    if (request.method === 'POST' && sessionId) {
       const body = await request.json().catch(() => null);
       return await handleSsePost(
-        url.searchParams.get('session') ?? '',
+        sessionId,
         body,
         env,
         structuredOutput,
+        ctx,
       );
     }
 
@@ -283,7 +292,7 @@ export default {
     }
 
     if (body.method === 'listTools') {
-      return json(ListToolsResponse);
+      return jsonText(LIST_TOOLS_BODY);
     }
 
     if (body.method === 'callTool') {
@@ -292,19 +301,16 @@ export default {
         return json({ error: 'invalid_params', details: parsed.error.format() });
       }
 
+      // CallToolSchema restricts name to toolNames, so no further lookup is needed
       const { name, arguments: args } = parsed.data;
-      if (!toolNames.includes(name)) {
-        return json({ error: 'unknown_tool' });
-      }
-
       try {
         switch (name) {
           case 'search_records':
-            return await handleSearchRecords(env, args);
+            return toResponse(await handleSearchRecords(env, args));
           case 'get_record':
-            return await handleGetRecord(env, args);
+            return toResponse(await handleGetRecord(env, args));
           case 'list_organizations':
-            return await handleListOrganizations(env, args);
+            return toResponse(await handleListOrganizations(env, args));
           case 'help':
             return json({ result: buildHelpPayload() });
         }
@@ -354,7 +360,11 @@ const FULL_RECORD_FIELDS = [
   'measurements',
 ];
 
-function normalizeRequestedFields(fields: string[]): { apiFields: string[]; outputFields: string[] } {
+function normalizeRequestedFields(fields: string[]): {
+  apiFields: string[];
+  outputFields: string[];
+  outputFieldSet: Set<string>;
+} {
   const apiFields: string[] = [];
   const outputFields: string[] = [];
   for (const field of fields) {
@@ -399,12 +409,18 @@ function normalizeRequestedFields(fields: string[]): { apiFields: string[]; outp
     apiFields.push(field);
     outputFields.push(field);
   }
+  const outputFieldSet = new Set(outputFields);
   return {
     apiFields: Array.from(new Set(apiFields)),
-    outputFields: Array.from(new Set(outputFields)),
+    outputFields: Array.from(outputFieldSet),
+    outputFieldSet,
   };
 }
 
+// Field mappings for the default field sets are computed once and shared by all requests
+const COMPACT_SEARCH_FIELD_MAPPING = normalizeRequestedFields(COMPACT_SEARCH_API_FIELDS);
+const FULL_RECORD_FIELD_MAPPING = normalizeRequestedFields(FULL_RECORD_FIELDS);
+
 function normalizeRecordOrganizations(record: Record<string, unknown>): Record<string, unknown> {
   if (!record || typeof record !== 'object') {
     return record;
@@ -543,52 +559,57 @@ function buildCompactSearchRecord(
   return pruneEmptyFields(output);
 }
 
+const DERIVED_FIELDS = ['organization', 'creators', 'links', 'format', 'type', 'description'];
+
 function applyDerivedFields(
   record: Record<string, unknown>,
-  outputFields: string[],
+  outputFields: ReadonlySet<string>,
   options: { linksLimit: number; creatorsLimit: number; imageLimit: number },
 ): Record<string, unknown> {
-  let derived = record;
-  if (outputFields.includes('organization')) {
+  if (!DERIVED_FIELDS.some((field) => outputFields.has(field))) {
+    return record;
+  }
+  // Copy once and assign derived fields in place instead of re-spreading per field
+  const derived: Record<string, unknown> = { ...record };
+  if (outputFields.has('organization')) {
     const summary = buildOrganizationSummary(record);
     if (summary) {
-      derived = { ...derived, organization: summary };
+      derived.organization = summary;
     }
   }
-  if (outputFields.includes('creators')) {
+  if (outputFields.has('creators')) {
     const creatorsResult = buildCompactCreators(record, options.creatorsLimit);
-    derived = {
-      ...derived,
-      creators: creatorsResult.creators,
-      ...(creatorsResult.total > creatorsResult.creators.length
-        ? { creatorsTotal: creatorsResult.total }
-        : {}),
-    };
+    derived.creators = creatorsResult.creators;
+    if (creatorsResult.total > creatorsResult.creators.length) {
+      derived.creatorsTotal = creatorsResult.total;
+    }
   }
-  if (outputFields.includes('links')) {
+  if (outputFields.has('links')) {
     const linksResult = buildCompactLinks(record, {
       limit: options.linksLimit,
       imageLimit: options.imageLimit,
     });
-    derived = {
-      ...derived,
-      links: linksResult.links,
-      ...(linksResult.total > linksResult.links.length ? { linksTotal: linksResult.total } : {}),
-      ...(linksResult.imageCount ? { imageCount: linksResult.imageCount } : {}),
-    };
+    derived.links = linksResult.links;
+    if (linksResult.total > linksResult.links.length) {
+      derived.linksTotal = linksResult.total;
+    }
+    if (linksResult.imageCount) {
+      derived.imageCount = linksResult.imageCount;
+    }
   }
-  if (outputFields.includes('format') || outputFields.includes('type')) {
+  if (outputFields.has('format') || outputFields.has('type')) {
     const summary = resolveFormatSummary(record);
-    derived = {
-      ...derived,
-      ...(outputFields.includes('format') && summary.format ? { format: summary.format } : {}),
-      ...(outputFields.includes('type') && summary.type ? { type: summary.type } : {}),
-    };
+    if (outputFields.has('format') && summary.format) {
+      derived.format = summary.format;
+    }
+    if (outputFields.has('type') && summary.type) {
+      derived.type = summary.type;
+    }
   }
-  if (outputFields.includes('description')) {
+  if (outputFields.has('description')) {
     const description = buildDescription(record, { mode: 'short' });
     if (description) {
-      derived = { ...derived, description };
+      derived.description = description;
     }
   }
   return derived;
@@ -628,10 +649,10 @@ function buildDescription(
   return trimmed.length > max ? `${trimmed.slice(0, max).trim()}…` : trimmed;
 }
 
-async function handleSearchRecords(env: Env, args: unknown): Promise<Response> {
+async function handleSearchRecords(env: Env, args: unknown): Promise<HandlerOutput> {
   const parsed = SearchRecordsArgs.safeParse(args ?? {});
   if (!parsed.success) {
-    return json({ error: 'invalid_params', details: parsed.error.format() }, 400);
+    return { payload: { error: 'invalid_params', details: parsed.error.format() }, status: 400 };
   }
   const {
     query,
@@ -665,10 +686,9 @@ async function handleSearchRecords(env: Env, args: unknown): Promise<Response> {
   });
   const buildingWarnings = collectHierarchicalFilterWarnings(normalizedFilters);
   const normalizedSort = normalizeSort(sort);
-  const selectedFields = useCompactOutput
-    ? COMPACT_SEARCH_API_FIELDS
-    : fields;
-  const { apiFields, outputFields } = normalizeRequestedFields(selectedFields);
+  const { apiFields, outputFields, outputFieldSet } = useCompactOutput
+    ? COMPACT_SEARCH_FIELD_MAPPING
+    : normalizeRequestedFields(fields);
 
   const url = buildSearchUrl({
     apiBase: env.FINNA_API_BASE,
@@ -715,12 +735,12 @@ async function handleSearchRecords(env: Env, args: unknown): Promise<Response> {
       )
     : normalized.map((record) =>
         pickFields(
-          applyDerivedFields(record, outputFields, { linksLimit: LINKS_LIMIT, creatorsLimit: CREATORS_LIMIT, imageLimit: IMAGE_LIMIT }),
+          applyDerivedFields(record, outputFieldSet, { linksLimit: LINKS_LIMIT, creatorsLimit: CREATORS_LIMIT, imageLimit: IMAGE_LIMIT }),
           outputFields,
         ),
       );
   const cleaned =
-    outputFields && !outputFields.includes('recordUrl')
+    !outputFieldSet.has('recordUrl')
       ? compacted.map((record) => stripRecordUrl(record))
       : compacted;
   const meta = buildSearchMeta({
@@ -739,24 +759,27 @@ async function handleSearchRecords(env: Env, args: unknown): Promise<Response> {
   // Rename facet fields (value→code, label→name, count→records) for consistency
   const result = renameFacetFields(baseResult);
 
-  return json({
-    result: {
-      ...result,
-      records: cleaned,
-      ...(meta ? { meta } : {}),
-      webUrl,
+  return {
+    payload: {
+      result: {
+        ...result,
+        records: cleaned,
+        ...(meta ? { meta } : {}),
+        webUrl,
+      },
     },
-  });
+  };
 }
 
-async function handleGetRecord(env: Env, args: unknown): Promise<Response> {
+async function handleGetRecord(env: Env, args: unknown): Promise<HandlerOutput> {
   const parsed = GetRecordArgs.safeParse(args);
   if (!parsed.success) {
-    return json({ error: 'invalid_params', details: parsed.error.format() }, 400);
+    return { payload: { error: 'invalid_params', details: parsed.error.format() }, status: 400 };
   }
   const { ids, lng, fields } = parsed.data;
-  const selectedFields = fields ?? FULL_RECORD_FIELDS;
-  const { apiFields, outputFields } = normalizeRequestedFields(selectedFields);
+  const { apiFields, outputFields, outputFieldSet } = fields
+    ? normalizeRequestedFields(fields)
+    : FULL_RECORD_FIELD_MAPPING;
 
   const url = buildRecordUrl({
     apiBase: env.FINNA_API_BASE,
@@ -774,27 +797,29 @@ async function handleGetRecord(env: Env, args: unknown): Promise<Response> {
   );
   const derived = enriched.map((record) =>
     pickFields(
-      applyDerivedFields(record, outputFields, { linksLimit: LINKS_LIMIT, creatorsLimit: CREATORS_LIMIT, imageLimit: IMAGE_LIMIT }),
+      applyDerivedFields(record, outputFieldSet, { linksLimit: LINKS_LIMIT, creatorsLimit: CREATORS_LIMIT, imageLimit: IMAGE_LIMIT }),
       outputFields,
     ),
   );
   const cleaned =
-    outputFields && !outputFields.includes('recordUrl')
+    !outputFieldSet.has('recordUrl')
       ? derived.map((record) => stripRecordUrl(record))
       : derived;
 
-  return json({
-    result: {
-      status: (payload as { status?: string }).status ?? 'OK',
-      records: cleaned,
+  return {
+    payload: {
+      result: {
+        status: (payload as { status?: string }).status ?? 'OK',
+        records: cleaned,
+      },
     },
-  });
+  };
 }
 
-async function handleListOrganizations(env: Env, args: unknown): Promise<Response> {
+async function handleListOrganizations(env: Env, args: unknown): Promise<HandlerOutput> {
   const parsed = ListOrganizationsArgs.safeParse(args ?? {});
   if (!parsed.success) {
-    return json({ error: 'invalid_params', details: parsed.error.format() }, 400);
+    return { payload: { error: 'invalid_params', details: parsed.error.format() }, status: 400 };
   }
   const { lng } = parsed.data;
 
@@ -808,21 +833,27 @@ async function handleListOrganizations(env: Env, args: unknown): Promise<Respons
     limit: 0,
   });
 
-  const payload = await fetchJson(url) as {
+  const payload = await fetchJson(url, {
+    cacheTtl: parseCacheTtl(env.FINNA_ORGANIZATIONS_TTL, DEFAULT_ORGANIZATIONS_CACHE_TTL),
+  }) as {
     facets?: {
       building?: Array<{ value?: string; translated?: string; count?: number }>;
     };
   };
 
   // Transform API format to match FacetEntry structure
-  const buildingEntries = (payload.facets?.building ?? [])
-    .filter((entry) => entry.value && entry.translated)
-    .map((entry) => ({
-      value: entry.value!,
-      label: entry.translated!,
-      translated: entry.translated!,
+  const buildingEntries: Array<{ value: string; label: string; translated: string; count?: number }> = [];
+  for (const entry of payload.facets?.building ?? []) {
+    if (!entry.value || !entry.translated) {
+      continue;
+    }
+    buildingEntries.push({
+      value: entry.value,
+      label: entry.translated,
+      translated: entry.translated,
       count: entry.count,
-    }));
+    });
+  }
 
   const result = {
     status: 'OK',
@@ -832,7 +863,7 @@ async function handleListOrganizations(env: Env, args: unknown): Promise<Respons
 
   // Rename value→code, label→name, count→records for consistency
   const normalized = renameFacetFields(result);
-  return json({ result: normalized });
+  return { payload: { result: normalized } };
 }
 
 // Rename facet fields: value→code, label→name, count→records
@@ -1005,26 +1036,28 @@ function normalizeYearValues(values: string[]): { exact: string[]; ranges: strin
   return { exact, ranges };
 }
 
+const USAGE_RIGHTS_CODES: Record<string, string> = {
+  public_domain: 'usage_A',
+  open: 'usage_B',
+  commercial_noderivatives: 'usage_C',
+  noncommercial: 'usage_D',
+  noncommercial_noderivatives: 'usage_E',
+  restricted: 'usage_F',
+};
+
 function normalizeUsageRightsValues(values: string[]): string[] {
-  const map: Record<string, string> = {
-    public_domain: 'usage_A',
-    open: 'usage_B',
-    commercial_noderivatives: 'usage_C',
-    noncommercial: 'usage_D',
-    noncommercial_noderivatives: 'usage_E',
-    restricted: 'usage_F',
-  };
-  return values
-    .filter((value) => typeof value === 'string')
-    .map((value) => {
-      const normalized = value.trim();
-      if (!normalized) {
-        return normalized;
-      }
-      const key = normalized.toLowerCase();
-      return map[key] ?? normalized;
-    })
-    .filter((value) => value.length > 0);
+  const normalizedValues: string[] = [];
+  for (const value of values) {
+    if (typeof value !== 'string') {
+      continue;
+    }
+    const normalized = value.trim();
+    if (!normalized) {
+      continue;
+    }
+    normalizedValues.push(USAGE_RIGHTS_CODES[normalized.toLowerCase()] ?? normalized);
+  }
+  return normalizedValues;
 }
 
 function addFilterValues(
@@ -1068,24 +1101,20 @@ function normalizeFilterBucket(
   return Object.keys(include).length > 0 ? include : undefined;
 }
 
+const FILTER_FIELD_ALIASES = new Map<string, string>([
+  ['building_str_mv', 'building'],
+  ['organization', 'building'],
+  ['content_type', 'format'],
+  ['year', 'main_date_str'],
+]);
+
 function mapFilterField(field: string): string {
-  if (field === 'building_str_mv') {
-    return 'building';
-  }
-  if (field === 'organization') {
-    return 'building';
-  }
-  if (field === 'content_type') {
-    return 'format';
-  }
-  if (field === 'year') {
-    return 'main_date_str';
-  }
-  return field;
+  return FILTER_FIELD_ALIASES.get(field) ?? field;
 }
 
 function mapFilterValue(field: string, value: string): string {
-  if (/%2f/i.test(value)) {
+  // Most values carry no percent-escapes, so skip the regex for them
+  if (value.includes('%') && /%2f/i.test(value)) {
     const decoded = safeDecodeURIComponent(value);
     if (decoded) {
       value = decoded;
@@ -1396,10 +1425,12 @@ function stripFacetsIfUnused(
     }
     prunedFacets[name] = items;
   }
-  const adjusted: Record<string, unknown> = { ...payload, facets: prunedFacets };
-  if (pruned) {
-    adjusted.meta = { ...(asObject(adjusted.meta) ?? {}), prunedFacets: prunedNames };
+  if (!pruned) {
+    // Nothing was truncated, so the upstream payload can be returned as is
+    return payload;
   }
+  const adjusted: Record<string, unknown> = { ...payload, facets: prunedFacets };
+  adjusted.meta = { ...(asObject(adjusted.meta) ?? {}), prunedFacets: prunedNames };
   return adjusted;
 }
 
@@ -1411,71 +1442,50 @@ function limitHierarchicalFacet(
   if (total <= limit) {
     return { items: values, truncated: false };
   }
-  const queue: Array<{ node: Record<string, unknown>; depth: number }> = values.map((node) => ({
-    node,
-    depth: 0,
-  }));
-  const grouped: Map<number, Array<Record<string, unknown>>> = new Map();
-  while (queue.length > 0) {
-    const current = queue.shift()!;
-    const level = grouped.get(current.depth) ?? [];
-    level.push(current.node);
-    grouped.set(current.depth, level);
-    const children = current.node.children;
-    if (Array.isArray(children)) {
-      for (const child of children) {
-        if (child && typeof child === 'object') {
-          queue.push({ node: child as Record<string, unknown>, depth: current.depth + 1 });
-        }
-      }
-    }
-  }
-
-  const levelKeys = Array.from(grouped.keys()).sort((a, b) => a - b);
-  const picked: Record<string, unknown>[] = [];
-  for (const depth of levelKeys) {
-    const level = grouped.get(depth) ?? [];
-    for (const node of level) {
-      if (picked.length >= limit) {
-        break;
-      }
-      picked.push(node);
-    }
-    if (picked.length >= limit) {
-      break;
-    }
-  }
-  return { items: picked, truncated: true };
+  // Nodes are picked breadth-first, and the top level alone already exceeds the
+  // limit here, so only the leading top-level entries can ever be selected.
+  return { items: values.slice(0, limit), truncated: true };
 }
 
+const SORT_ALIASES: Record<string, string> = {
+  relevance: 'relevance,id asc',
+  newest: 'first_indexed desc',
+  newest_first: 'first_indexed desc',
+  latest: 'first_indexed desc',
+  oldest: 'first_indexed asc',
+  oldest_first: 'first_indexed asc',
+  earliest: 'first_indexed asc',
+  year_newest: 'main_date_str desc',
+  'year newest': 'main_date_str desc',
+  year_oldest: 'main_date_str asc',
+  'year oldest': 'main_date_str asc',
+};
+
 function normalizeSort(sort?: string): string | undefined {
   if (!sort) {
     return sort;
   }
-  const normalized = sort.trim().toLowerCase();
-  if (normalized === 'relevance') {
-    return 'relevance,id asc';
-  }
-  if (normalized === 'newest' || normalized === 'newest_first' || normalized === 'latest') {
-    return 'first_indexed desc';
-  }
-  if (normalized === 'oldest' || normalized === 'oldest_first' || normalized === 'earliest') {
-    return 'first_indexed asc';
-  }
-  if (normalized === 'year_newest' || normalized === 'year newest') {
-    return 'main_date_str desc';
-  }
-  if (normalized === 'year_oldest' || normalized === 'year oldest') {
-    return 'main_date_str asc';
-  }
-  return sort;
+  return SORT_ALIASES[sort.trim().toLowerCase()] ?? sort;
 }
 
 
-async function fetchJson(url: string): Promise<Record<string, unknown>> {
+async function fetchJson(
+  url: string,
+  options: { cacheTtl?: number } = {},
+): Promise<Record<string, unknown>> {
   const response = await fetch(url, {
     method: 'GET',
     headers: { accept: 'application/json' },
+    signal: AbortSignal.timeout(UPSTREAM_TIMEOUT_MS),
+    // Only successful answers get the full TTL; error statuses must not pin a failure in cache
+    ...(options.cacheTtl
+      ? {
+          cf: {
+            cacheTtlByStatus: { '200-299': options.cacheTtl, '404': 1, '500-599': 0 },
+            cacheEverything: true,
+          },
+        }
+      : {}),
   });
   if (!response.ok) {
     throw new Error(`Upstream error ${response.status}`);
@@ -1483,6 +1493,14 @@ async function fetchJson(url: string): Promise<Record<string, unknown>> {
   return (await response.json()) as Record<string, unknown>;
 }
 
+function parseCacheTtl(value: string | undefined, fallback: number): number {
+  if (value === undefined || value.trim() === '') {
+    return fallback;
+  }
+  const parsed = Number(value);
+  return Number.isFinite(parsed) && parsed >= 0 ? Math.floor(parsed) : fallback;
+}
+
 function errorMessage(error: unknown): string {
   if (error instanceof Error) {
     return error.message;
@@ -1490,8 +1508,22 @@ function errorMessage(error: unknown): string {
   return String(error);
 }
 
+// Tool handler output shared by the legacy callTool and JSON-RPC paths
+type HandlerOutput = {
+  payload: Record<string, unknown>;
+  status?: number;
+};
+
+function toResponse(output: HandlerOutput): Response {
+  return json(output.payload, output.status);
+}
+
 function json(payload: unknown, status = 200): Response {
-  return new Response(JSON.stringify(payload), {
+  return jsonText(JSON.stringify(payload), status);
+}
+
+function jsonText(body: string, status = 200): Response {
+  return new Response(body, {
     status,
     headers: { 'content-type': 'application/json' },
   });
@@ -1540,15 +1572,6 @@ function stripQuotedTerms(query: string): string {
   return query.replace(/"[^"]+"/g, '').trim();
 }
 
-function looksMultiTerm(query: string): boolean {
-  const trimmed = query.trim();
-  if (!trimmed) {
-    return false;
-  }
-  const unquoted = stripQuotedTerms(trimmed);
-  return /\s/.test(unquoted);
-}
-
 function countQueryTerms(query: string): number {
   const trimmed = query.trim();
   if (!trimmed) {
@@ -1574,6 +1597,8 @@ function hasOnlineFilter(filters?: FilterInput): boolean {
   return false;
 }
 
+const RESOURCE_FIELDS = new Set(['images', 'urls', 'onlineUrls', 'links']);
+
 function buildSearchMeta(options: {
   query: string;
   search_mode?: string;
@@ -1598,22 +1623,8 @@ function buildSearchMeta(options: {
     records,
   } = options;
   const selectedFields = fields ?? COMPACT_SEARCH_API_FIELDS;
-  const resourceFields = new Set(['images', 'urls', 'onlineUrls', 'links']);
   const includesResourceFields =
-    (!fieldsProvided && selectedFields.some((field) => resourceFields.has(field)));
-  const hasResourceData = records.some((record) => {
-    const images = record.images;
-    const urls = record.urls;
-    const onlineUrls = record.onlineUrls;
-    const links = record.links;
-    return (
-      (Array.isArray(images) && images.length > 0) ||
-      (Array.isArray(urls) && urls.length > 0) ||
-      (Array.isArray(onlineUrls) && onlineUrls.length > 0) ||
-      (Array.isArray(links) && links.length > 0)
-    );
-  });
-
+    (!fieldsProvided && selectedFields.some((field) => RESOURCE_FIELDS.has(field)));
   const termCount = countQueryTerms(query);
   if (
     search_mode !== 'advanced' &&
@@ -1625,7 +1636,8 @@ function buildSearchMeta(options: {
       'Multi-term query with few results; consider search_mode="advanced" with advanced_operator="AND" for more control.',
     );
   }
-  if (search_mode === 'advanced' && !looksMultiTerm(query)) {
+  // Unquoted terms are whitespace-separated, so a multi-term query has at least two
+  if (search_mode === 'advanced' && termCount < 2) {
     info.push('Advanced search used with a single term; simple mode may be faster.');
   }
   if (typeof resultCount === 'number' && resultCount === 0) {
@@ -1638,7 +1650,13 @@ function buildSearchMeta(options: {
       'Large result set. Consider narrowing with filters.include.organization or filters.include.format.',
     );
   }
-  if (options.requestedOnline && includesResourceFields && records.length > 0 && !hasResourceData) {
+  // Scanning the records is the costly part, so it only runs when the hint could apply
+  if (
+    options.requestedOnline &&
+    includesResourceFields &&
+    records.length > 0 &&
+    !recordsHaveResourceData(records)
+  ) {
     info.push(
       'No online resources found in these records; try get_record(ids=[...]) for full metadata.',
     );
@@ -1663,6 +1681,21 @@ function buildSearchMeta(options: {
   return meta;
 }
 
+function recordsHaveResourceData(records: Record<string, unknown>[]): boolean {
+  return records.some((record) => {
+    const images = record.images;
+    const urls = record.urls;
+    const onlineUrls = record.onlineUrls;
+    const links = record.links;
+    return (
+      (Array.isArray(images) && images.length > 0) ||
+      (Array.isArray(urls) && urls.length > 0) ||
+      (Array.isArray(onlineUrls) && onlineUrls.length > 0) ||
+      (Array.isArray(links) && links.length > 0)
+    );
+  });
+}
+
 type JsonRpcRequest = {
   jsonrpc: string;
   id?: string | number | null;
@@ -1683,8 +1716,26 @@ async function handleJsonRpc(
   env: Env,
   structuredOutput: boolean,
 ): Promise<Response> {
+  const payload = await resolveJsonRpc(body, env, structuredOutput);
+  if (!payload) {
+    return new Response(null, { status: 204 });
+  }
+  return json(payload);
+}
+
+// Returns the JSON-RPC response payload, or null for notifications
+async function resolveJsonRpc(
+  body: JsonRpcRequest,
+  env: Env,
+  structuredOutput: boolean,
+): Promise<Record<string, unknown> | null> {
   const { id, method } = body;
 
+  // Messages without an id are notifications, and JSON-RPC forbids replying to them
+  if (id === undefined) {
+    return null;
+  }
+
   if (method === 'initialize') {
     const serverInfo = { ...SERVER_INFO };
     if (env.ASSETS_BASE_URL) {
@@ -1697,85 +1748,62 @@ async function handleJsonRpc(
         },
       ];
     }
-    return json(
-      jsonRpcResult(id, {
-        protocolVersion: MCP_PROTOCOL_VERSION,
-        capabilities: { tools: {} },
-        serverInfo,
-      }),
-    );
-  }
-
-  if (method === 'notifications/initialized') {
-    return new Response(null, { status: 204 });
+    return jsonRpcResult(id, {
+      protocolVersion: MCP_PROTOCOL_VERSION,
+      capabilities: { tools: {} },
+      serverInfo,
+    });
   }
 
   if (method === 'tools/list') {
-    return json(jsonRpcResult(id, ListToolsResponse));
+    return jsonRpcResult(id, ListToolsResponse);
   }
 
   if (method === 'tools/call') {
     const params = body.params ?? {};
     const parsed = CallToolSchema.safeParse(params);
     if (!parsed.success) {
-      return json(
-        jsonRpcError(id, -32602, 'Invalid params', parsed.error.format()),
-        200,
-      );
+      return jsonRpcError(id, -32602, 'Invalid params', parsed.error.format());
     }
 
     const { name, arguments: args } = parsed.data;
-    if (!toolNames.includes(name)) {
-      return json(jsonRpcError(id, -32601, 'Method not found'), 200);
-    }
-
     try {
       const result = await dispatchTool(name, args, env);
       const contentText = summarizeToolResult(name, result);
-      return json(
-        jsonRpcResult(
-          id,
-          buildToolOutput(name, result, contentText, structuredOutput),
-        ),
+      return jsonRpcResult(
+        id,
+        buildToolOutput(name, result, contentText, structuredOutput),
       );
     } catch (error) {
       const message = errorMessage(error);
-      return json(
-        jsonRpcResult(
-          id,
-          buildToolErrorOutput(name, message, structuredOutput),
-        ),
-        200,
+      return jsonRpcResult(
+        id,
+        buildToolErrorOutput(name, message, structuredOutput),
       );
     }
   }
 
-  return json(jsonRpcError(id, -32601, 'Method not found'), 200);
+  return jsonRpcError(id, -32601, 'Method not found');
 }
 
-const sseSessions = new Map<
-  string,
-  { controller: ReadableStreamDefaultController<Uint8Array> }
->();
+type SseSession = { controller: ReadableStreamDefaultController<Uint8Array> };
 
-function handleSseRequest(request: Request, structuredOutput: boolean): Response {
-  const accept = request.headers.get('accept') ?? '';
-  if (!accept.includes('text/event-stream')) {
-    return new Response('Method Not Allowed', { status: 405 });
-  }
+const sseSessions = new Map<string, SseSession>();
+const sseEncoder = new TextEncoder();
 
+// The caller has already checked the accept header
+function handleSseRequest(url: URL, structuredOutput: boolean): Response {
   const sessionId = crypto.randomUUID();
-  const encoder = new TextEncoder();
   const stream = new ReadableStream<Uint8Array>({
     start(controller) {
       sseSessions.set(sessionId, { controller });
-      const endpointUrl = new URL(request.url);
+      const endpointUrl = new URL(url);
       endpointUrl.searchParams.set('session', sessionId);
       if (structuredOutput) {
         endpointUrl.searchParams.set('structured_output', '1');
       }
       const payload = `event: endpoint\ndata: ${endpointUrl.toString()}\n\n`;
-      controller.enqueue(encoder.encode(payload));
+      controller.enqueue(sseEncoder.encode(payload));
     },
     cancel() {
       sseSessions.delete(sessionId);
@@ -1797,6 +1825,7 @@ async function handleSsePost(
   body: unknown,
   env: Env,
   structuredOutput: boolean,
+  ctx: ExecutionContext,
 ): Promise<Response> {
   try {
     const session = sseSessions.get(sessionId);
@@ -1809,15 +1838,9 @@ async function handleSsePost(
       return json({ error: 'invalid_request' }, 400);
     }
 
-    const response = await handleJsonRpc(rpcParsed.data, env, structuredOutput);
-    const jsonBody = await response.text();
-    const encoder = new TextEncoder();
-    const message = `event: message\ndata: ${jsonBody}\n\n`;
-    try {
-      session.controller.enqueue(encoder.encode(message));
-    } catch (error) {
-      console.error('Failed to enqueue SSE message', error);
-    }
+    // Acknowledge right away; the result is delivered over the event stream
+    const delivery = deliverSseMessage(sessionId, session, rpcParsed.data, env, structuredOutput);
+    ctx.waitUntil(delivery);
 
     return new Response(null, { status: 202 });
   } catch (error) {
@@ -1826,6 +1849,51 @@ async function handleSsePost(
   }
 }
 
+async function deliverSseMessage(
+  sessionId: string,
+  session: SseSession,
+  body: JsonRpcRequest,
+  env: Env,
+  structuredOutput: boolean,
+): Promise<void> {
+  try {
+    const payload = await resolveJsonRpc(body, env, structuredOutput);
+    if (!payload) {
+      // Notifications have no response, so there is nothing to push
+      return;
+    }
+    if (sseSessions.get(sessionId) !== session) {
+      // The client disconnected while the call was running
+      return;
+    }
+    enqueueSseMessage(sessionId, session, payload);
+  } catch (error) {
+    console.error('Failed to deliver SSE message', error);
+    // The POST was already acknowledged, so report the failure over the stream
+    // rather than leaving the client waiting for a reply to this id
+    if (body.id !== undefined && sseSessions.get(sessionId) === session) {
+      try {
+        enqueueSseMessage(sessionId, session, jsonRpcError(body.id, -32603, 'Internal error'));
+      } catch (enqueueError) {
+        console.error('Failed to enqueue SSE error message', enqueueError);
+      }
+    }
+  }
+}
+
+function enqueueSseMessage(sessionId: string, session: SseSession, payload: unknown) {
+  const message = `event: message\ndata: ${JSON.stringify(payload)}\n\n`;
+  try {
+    session.controller.enqueue(sseEncoder.encode(message));
+  } catch (error) {
+    // The stream closed without cancel() running; drop the session so it does not linger
+    if (sseSessions.get(sessionId) === session) {
+      sseSessions.delete(sessionId);
+    }
+    throw error;
+  }
+}
+
 function isJsonRpc(body: unknown): body is JsonRpcRequest {
   return (
     typeof body === 'object' &&
@@ -2003,8 +2071,8 @@ async function dispatchTool(
   }
 }
 
-async function unwrapResult(responsePromise: Promise<Response>): Promise<Record<string, unknown>> {
-  const response = await responsePromise;
-  const payload = (await response.json()) as Record<string, unknown>;
+async function unwrapResult(outputPromise: Promise<HandlerOutput>): Promise<Record<string, unknown>> {
+  // Use the handler payload directly instead of serializing it into a Response and parsing it back
+  const { payload } = await outputPromise;
   return payload.result as Record<string, unknown>;
 }
@@ -1,8 +1,38 @@
 import { describe, it, expect, beforeEach, afterEach, vi } from 'vitest';
 import worker from '../src/index.js';
+import { buildCompactLinks } from '../src/finna.js';
 
 describe('worker', () => {
   const baseEnv = {} as Parameters<typeof worker.fetch>[1];
+  const ctx = {
+    waitUntil: () => {},
+    passThroughOnException: () => {},
+  } as unknown as ExecutionContext;
+
+  const openSseSession = async () => {
+    const response = await worker.fetch(
+      new Request('http://example.com/mcp', {
+        method: 'GET',
+        headers: { accept: 'text/event-stream' },
+      }),
+      baseEnv,
+      ctx,
+    );
+    const reader = response.body?.getReader();
+    if (!reader) {
+      throw new Error('Missing SSE reader');
+    }
+    const first = await reader.read();
+    const endpoint = new TextDecoder()
+      .decode(first.value)
+      .split('\n')
+      .find((line) => line.startsWith('data: '))
+      ?.slice(6);
+    if (!endpoint) {
+      throw new Error('Missing endpoint data');
+    }
+    return { reader, endpoint };
+  };
 
   beforeEach(() => {
     vi.stubGlobal('fetch', vi.fn());
@@ -15,7 +45,7 @@ describe('worker', () => {
 
   it('rejects non-POST', async () => {
     const request = new Request('http://example.com/mcp', { method: 'GET' });
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(405);
   });
 
@@ -26,7 +56,7 @@ describe('worker', () => {
       body: JSON.stringify({ method: 'listTools' }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(200);
     const payload = await response.json();
     expect(payload.tools?.length).toBeGreaterThan(0);
@@ -58,7 +88,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     const contentText = payload.result.content[0].text as string;
     const parsed = JSON.parse(contentText);
@@ -93,13 +123,66 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     expect(payload.result.content[0].text).toContain('search_records');
     expect(payload.result.structuredContent.summary).toContain('search_records');
     expect(payload.result.structuredContent.response.resultCount).toBe(2);
   });
 
+  it('reports upstream timeouts as tool errors', async () => {
+    // Drive AbortSignal.timeout from fake timers so the test does not wait on the real clock
+    const timeoutSpy = vi.spyOn(AbortSignal, 'timeout').mockImplementation((ms) => {
+      const controller = new AbortController();
+      setTimeout(() => {
+        controller.abort(new DOMException('The operation timed out.', 'TimeoutError'));
+      }, ms);
+      return controller.signal;
+    });
+    vi.useFakeTimers();
+    try {
+      const mockFetch = vi.mocked(globalThis.fetch);
+      mockFetch.mockImplementation(
+        (_input, init) =>
+          new Promise<Response>((_resolve, reject) => {
+            init?.signal?.addEventListener('abort', () => reject(init.signal?.reason));
+          }),
+      );
+      const call = (body: unknown) =>
+        worker.fetch(
+          new Request('http://example.com/mcp', {
+            method: 'POST',
+            headers: { 'content-type': 'application/json' },
+            body: JSON.stringify(body),
+          }),
+          baseEnv,
+          ctx,
+        );
+
+      const legacyPending = call({
+        method: 'callTool',
+        params: { name: 'search_records', arguments: { query: 'example' } },
+      });
+      await vi.advanceTimersByTimeAsync(15000);
+      const legacy = await (await legacyPending).json();
+      expect(legacy.error).toBe('upstream_error');
+      expect(mockFetch.mock.calls[0][1]?.signal).toBeInstanceOf(AbortSignal);
+
+      const rpcPending = call({
+        jsonrpc: '2.0',
+        id: 1,
+        method: 'tools/call',
+        params: { name: 'search_records', arguments: { query: 'example' } },
+      });
+      await vi.advanceTimersByTimeAsync(15000);
+      const rpc = await (await rpcPending).json();
+      expect(rpc.result.isError).toBe(true);
+    } finally {
+      vi.useRealTimers();
+      timeoutSpy.mockRestore();
+    }
+  });
+
   it('search_records builds filters and enriches resources', async () => {
     const mockFetch = vi.mocked(globalThis.fetch);
     mockFetch.mockResolvedValueOnce(
@@ -148,7 +231,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     expect(payload.result.records[0].format).toBe('0/Image/');
     expect(payload.result.records[0].type).toBe('Kuva');
@@ -198,7 +281,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(200);
     const calledUrl = String(mockFetch.mock.calls[0][0]);
     expect(calledUrl).toContain('filter%5B%5D=building%3A%220%2FURHEILUMUSEO%2F%22');
@@ -231,7 +314,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(200);
     const calledUrl = String(mockFetch.mock.calls[0][0]);
     expect(calledUrl).toContain('join=OR');
@@ -266,7 +349,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     expect(payload.result.meta?.warning).toContain('Hierarchical facet');
   });
@@ -296,7 +379,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(200);
     const calledUrl = String(mockFetch.mock.calls[0][0]);
     expect(calledUrl).toContain('filter%5B%5D=building%3A%220%2FHelmet%2F%22');
@@ -327,7 +410,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     expect(payload.result.facets).toBeDefined();
   });
@@ -362,7 +445,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(200);
     const calledUrl = String(mockFetch.mock.calls[0][0]);
     expect(calledUrl).toContain('filter%5B%5D=online_boolean%3A%221%22');
@@ -406,7 +489,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     expect(payload.result.facets.building.length).toBe(1);
     expect(payload.result.facets.building[0].code).toBe('0/KANSALLISKIRJASTO/');
@@ -416,6 +499,41 @@ describe('worker', () => {
     expect(calledUrl).toContain('limit=0');
   });
 
+  it('list_organizations lets the edge cache hold the organization list', async () => {
+    const mockFetch = vi.mocked(globalThis.fetch);
+    mockFetch.mockImplementation(async () =>
+      new Response(JSON.stringify({ facets: { building: [] } }), {
+        status: 200,
+        headers: { 'content-type': 'application/json' },
+      }),
+    );
+
+    const callListOrganizations = (env: Parameters<typeof worker.fetch>[1]) =>
+      worker.fetch(
+        new Request('http://example.com/mcp', {
+          method: 'POST',
+          headers: { 'content-type': 'application/json' },
+          body: JSON.stringify({
+            method: 'callTool',
+            params: { name: 'list_organizations', arguments: {} },
+          }),
+        }),
+        env,
+        ctx,
+      );
+
+    await callListOrganizations(baseEnv);
+    expect(mockFetch.mock.calls[0][1]).toMatchObject({
+      cf: {
+        cacheTtlByStatus: { '200-299': 3600, '404': 1, '500-599': 0 },
+        cacheEverything: true,
+      },
+    });
+
+    await callListOrganizations({ FINNA_ORGANIZATIONS_TTL: '0' });
+    expect(mockFetch.mock.calls[1][1]).not.toHaveProperty('cf');
+  });
+
   it('get_record supports multiple ids and resource samples', async () => {
     const mockFetch = vi.mocked(globalThis.fetch);
     mockFetch.mockResolvedValueOnce(
@@ -446,7 +564,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     expect(payload.result.records[0].id).toBe('a.1');
     const calledUrl = String(mockFetch.mock.calls[0][0]);
@@ -483,7 +601,7 @@ describe('worker', () => {
       }),
     });
 
-    await worker.fetch(request, baseEnv);
+    await worker.fetch(request, baseEnv, ctx);
     const calledUrl = String(mockFetch.mock.calls[0][0]);
     expect(calledUrl).not.toContain('field%5B%5D=recordUrl');
     expect(calledUrl).toContain('field%5B%5D=buildings');
@@ -522,7 +640,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     const payload = await response.json();
     expect(payload.result.facets.building.length).toBe(2);
     expect(payload.result.facets.building[0].code).toBe('0/HELMET/');
@@ -535,7 +653,7 @@ describe('worker', () => {
       headers: { accept: 'text/event-stream' },
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(200);
     expect(response.headers.get('content-type')).toContain('text/event-stream');
 
@@ -549,33 +667,15 @@ describe('worker', () => {
   });
 
   it('routes JSON-RPC over SSE session', async () => {
-    const sseRequest = new Request('http://example.com/mcp', {
-      method: 'GET',
-      headers: { accept: 'text/event-stream' },
-    });
+    const { reader, endpoint } = await openSseSession();
 
-    const sseResponse = await worker.fetch(sseRequest, baseEnv);
-    const reader = sseResponse.body?.getReader();
-    if (!reader) {
-      throw new Error('Missing SSE reader');
-    }
-    const first = await reader.read();
-    const text = new TextDecoder().decode(first.value);
-    const endpointLine = text
-      .split('\n')
-      .find((line) => line.startsWith('data: '))
-      ?.slice(6);
-    if (!endpointLine) {
-      throw new Error('Missing endpoint data');
-    }
-
-    const postRequest = new Request(endpointLine, {
+    const postRequest = new Request(endpoint, {
       method: 'POST',
       headers: { 'content-type': 'application/json' },
       body: JSON.stringify({ jsonrpc: '2.0', id: 2, method: 'tools/list' }),
     });
 
-    const postResponse = await worker.fetch(postRequest, baseEnv);
+    const postResponse = await worker.fetch(postRequest, baseEnv, ctx);
     expect(postResponse.status).toBe(202);
 
     const second = await reader.read();
@@ -585,6 +685,153 @@ describe('worker', () => {
     await reader.cancel();
   });
 
+  it('does not push SSE messages for notifications', async () => {
+    const { reader, endpoint } = await openSseSession();
+
+    const post = (body: unknown) =>
+      worker.fetch(
+        new Request(endpoint, {
+          method: 'POST',
+          headers: { 'content-type': 'application/json' },
+          body: JSON.stringify(body),
+        }),
+        baseEnv,
+        ctx,
+      );
+
+    expect((await post({ jsonrpc: '2.0', method: 'notifications/initialized' })).status).toBe(202);
+    expect(
+      (
+        await post({
+          jsonrpc: '2.0',
+          method: 'notifications/cancelled',
+          params: { requestId: 1 },
+        })
+      ).status,
+    ).toBe(202);
+    expect((await post({ jsonrpc: '2.0', id: 4, method: 'tools/list' })).status).toBe(202);
+
+    const second = await reader.read();
+    const messageText = new TextDecoder().decode(second.value);
+    expect(messageText).toContain('"id":4');
+    await reader.cancel();
+  });
+
+  it('acknowledges SSE posts before the tool call completes', async () => {
+    let releaseUpstream: (response: Response) => void = () => {};
+    const mockFetch = vi.mocked(globalThis.fetch);
+    mockFetch.mockReturnValueOnce(
+      new Promise<Response>((resolve) => {
+        releaseUpstream = resolve;
+      }),
+    );
+
+    const { reader, endpoint } = await openSseSession();
+
+    const postResponse = await worker.fetch(
+      new Request(endpoint, {
+        method: 'POST',
+        headers: { 'content-type': 'application/json' },
+        body: JSON.stringify({
+          jsonrpc: '2.0',
+          id: 3,
+          method: 'tools/call',
+          params: { name: 'search_records', arguments: { query: 'example' } },
+        }),
+      }),
+      baseEnv,
+      ctx,
+    );
+    expect(postResponse.status).toBe(202);
+
+    releaseUpstream(
+      new Response(JSON.stringify({ resultCount: 0, records: [] }), {
+        status: 200,
+        headers: { 'content-type': 'application/json' },
+      }),
+    );
+    const second = await reader.read();
+    const messageText = new TextDecoder().decode(second.value);
+    expect(messageText).toContain('event: message');
+    expect(messageText).toContain('"id":3');
+    await reader.cancel();
+  });
+
+  it('reports SSE delivery failures as JSON-RPC internal errors', async () => {
+    const failingEnv = {
+      get ASSETS_BASE_URL(): string {
+        throw new Error('boom');
+      },
+    } as unknown as Parameters<typeof worker.fetch>[1];
+    const consoleError = vi.spyOn(console, 'error').mockImplementation(() => {});
+
+    try {
+      const { reader, endpoint } = await openSseSession();
+      const postResponse = await worker.fetch(
+        new Request(endpoint, {
+          method: 'POST',
+          headers: { 'content-type': 'application/json' },
+          body: JSON.stringify({ jsonrpc: '2.0', id: 7, method: 'initialize' }),
+        }),
+        failingEnv,
+        ctx,
+      );
+      expect(postResponse.status).toBe(202);
+
+      const second = await reader.read();
+      const messageText = new TextDecoder().decode(second.value);
+      expect(messageText).toContain('"id":7');
+      expect(messageText).toContain('"code":-32603');
+      await reader.cancel();
+    } finally {
+      consoleError.mockRestore();
+    }
+  });
+
+  it('drops SSE results for sessions cancelled mid-call', async () => {
+    let releaseUpstream: (response: Response) => void = () => {};
+    const mockFetch = vi.mocked(globalThis.fetch);
+    mockFetch.mockReturnValueOnce(
+      new Promise<Response>((resolve) => {
+        releaseUpstream = resolve;
+      }),
+    );
+    const waitUntil = vi.fn();
+    const postCtx = { waitUntil, passThroughOnException: () => {} } as unknown as ExecutionContext;
+    const consoleError = vi.spyOn(console, 'error').mockImplementation(() => {});
+
+    try {
+      const { reader, endpoint } = await openSseSession();
+      const postResponse = await worker.fetch(
+        new Request(endpoint, {
+          method: 'POST',
+          headers: { 'content-type': 'application/json' },
+          body: JSON.stringify({
+            jsonrpc: '2.0',
+            id: 5,
+            method: 'tools/call',
+            params: { name: 'search_records', arguments: { query: 'example' } },
+          }),
+        }),
+        baseEnv,
+        postCtx,
+      );
+      expect(postResponse.status).toBe(202);
+
+      await reader.cancel();
+      releaseUpstream(
+        new Response(JSON.stringify({ resultCount: 0, records: [] }), {
+          status: 200,
+          headers: { 'content-type': 'application/json' },
+        }),
+      );
+      await expect(waitUntil.mock.calls[0][0]).resolves.toBeUndefined();
+      expect(consoleError).not.toHaveBeenCalled();
+    } finally {
+      consoleError.mockRestore();
+    }
+  });
+
   it('help tool returns guide content', async () => {
     const request = new Request('http://example.com/mcp', {
       method: 'POST',
@@ -595,7 +842,7 @@ describe('worker', () => {
       }),
     });
 
-    const response = await worker.fetch(request, baseEnv);
+    const response = await worker.fetch(request, baseEnv, ctx);
     expect(response.status).toBe(200);
     const payload = await response.json();
     expect(typeof payload.result.markdown).toBe('string');
@@ -603,3 +850,13 @@ describe('worker', () => {
   });
 
 });
+
+describe('buildCompactLinks', () => {
+  it('classifies a link by the first known extension in the URL', () => {
+    const { links } = buildCompactLinks(
+      { onlineUrls: [{ url: 'https://example.com/doc.pdf?file=scan.jpg' }] },
+      { limit: 5, imageLimit: 1 },
+    );
+    expect(links).toEqual([{ url: 'https://example.com/doc.pdf?file=scan.jpg', type: 'pdf' }]);
+  });
+});